@@ -1,8 +1,14 @@
 import os
+import gzip
+import hashlib
+import importlib.util
+import queue
+import threading
+from collections import OrderedDict
 import yaml
 import pymysql
 from cryptography.fernet import Fernet
-from flask import Flask, request, jsonify, render_template, send_file
+from flask import Flask, Response, request, jsonify, render_template, send_file, send_from_directory, stream_with_context, url_for
 import requests
 from io import BytesIO
 import plotly
@@ -10,68 +16,114 @@ import plotly.graph_objs as go
 import json
 from decimal import Decimal
 from datetime import datetime
+import export
+import image_warmup
+from dba_sketch import DBASketch
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 app = Flask(__name__)
 
-# Load configuration
-config = yaml.safe_load(open('config.yml', 'r'))
-KEY = config['key'].encode('utf-8')
-db_config = config['database']
+# Per-worker connection pool and image ETag cache, created by init_worker() after fork
+_pool = None
+_image_etags = None
+_config_lock = threading.Lock()
+
+def load_config(path='config.yml'):
+    with open(path, 'r') as f:
+        return yaml.safe_load(f)
+
+def create_app(config_path='config.yml'):
+    """Load configuration and return the WSGI app.
+
+    Under gunicorn with preload_app this runs once in the master, so the
+    config, Fernet key and graph layouts are shared by every forked worker.
+    """
+    config = load_config(config_path)
+    app.config['DATABASE'] = config['database']
+    app.config['FERNET'] = Fernet(config['key'].encode('utf-8'))
+    app.config['SERVER'] = config.get('server') or {}
+    app.config['IMAGE_CACHE'] = (config.get('paths') or {}).get('image_cache', 'image_cache')
+    init_worker()
+    return app
+
+def init_worker():
+    """Reset per-process state. Called again in each worker after fork so that
+    workers never share database sockets with the master or each other."""
+    global _pool, _image_etags
+    _pool = queue.LifoQueue(maxsize=app.config.get('SERVER', {}).get('pool_size', 4))
+    _image_etags = OrderedDict()
+
+@app.before_request
+def ensure_configured():
+    # `flask run` and `python -m flask --app app run` serve the module-level app
+    # without calling create_app(), so configure it on the first request
+    if 'DATABASE' not in app.config:
+        with _config_lock:
+            if 'DATABASE' not in app.config:
+                create_app()
 
-def encrypt_string(message, key):
+def get_db():
     try:
-        f = Fernet(key)
+        conn = _pool.get_nowait()
+        conn.ping(reconnect=True)
+    except queue.Empty:
+        conn = pymysql.connect(**app.config['DATABASE'], autocommit=True)
+    return conn
+
+def release_db(conn):
+    try:
+        _pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+def encrypt_string(message, key=None):
+    try:
+        f = Fernet(key) if key is not None else app.config['FERNET']
         encrypted_message = f.encrypt(message.encode())
         return encrypted_message.decode()
     except Exception as e:
         print(f"Encryption error: {e}")
         return None
 
-def create_multigraph(time_labels, max_dba, vehicle_counts, interval='10min'):
-    if not time_labels:
-        if interval == '10min':
-            time_labels = [f"{h}:{m:02d}" for h in range(7, 20) for m in range(0, 60, 10)]
-            max_dba = [0] * len(time_labels)
-            vehicle_counts = [0] * len(time_labels)
-        else:
-            time_labels = [str(i) for i in range(1, 32)]
-            max_dba = [0] * 31
-            vehicle_counts = [0] * 31
-    
-    fig = go.Figure()
-    
-    fig.add_trace(go.Bar(
-        x=time_labels,
-        y=max_dba,
-        name='Max dBA',
-        marker_color='#20c997',
-        opacity=0.6,
-        yaxis='y'
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=time_labels,
-        y=vehicle_counts,
-        name='Vehicle Count',
-        mode='lines+markers',
-        marker=dict(size=6, color='#fd7e14'),
-        line=dict(width=2, color='#fd7e14'),
-        yaxis='y2'
-    ))
-    
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+# Colors cycled across periods in overlay graphs
+OVERLAY_COLORS = ['#20c997', '#fd7e14', '#0d6efd', '#d63384', '#6f42c1', '#198754', '#dc3545', '#6c757d']
+
+def grid_image_url(raw_img):
+    """Serve the warmup worker's local thumbnail, else its full image, else the file repository."""
+    if os.path.exists(image_warmup.thumbnail_path(app.config['IMAGE_CACHE'], raw_img)):
+        return url_for('cached_thumbnail', name=image_warmup.cache_name(raw_img))
+    # Without Pillow no thumbnails are written; the full image is still local
+    if os.path.exists(image_warmup.image_path(app.config['IMAGE_CACHE'], raw_img)):
+        return url_for('cached_full_image', name=image_warmup.cache_name(raw_img))
+    encrypted_img = encrypt_string(raw_img)
+    return f'https://filerepo.clarksonmsda.org:444/fetch/{encrypted_img}'
+
+def build_layout(interval):
     if interval == '10min':
         tickvals = [f"{h}:00" for h in range(7, 20)]
         ticktext = [f"{h}:00" for h in range(7, 20)]
         title = "Traffic Noise and Vehicle Counts (07:00 - 19:00)"
+        xaxis_title = "Time of Day"
+    elif interval == 'week':
+        tickvals = WEEKDAYS
+        ticktext = WEEKDAYS
+        title = "Traffic Noise and Vehicle Counts by Weekday"
+        xaxis_title = "Day of Week"
     else:
         tickvals = [str(i) for i in range(1, 32, 5)]
         ticktext = [str(i) for i in range(1, 32, 5)]
         title = "Traffic Noise and Vehicle Counts by Day"
+        xaxis_title = "Day of Month"
     
-    fig.update_layout(
+    layout = go.Layout(
         title=title,
         xaxis=dict(
-            title="Time of Day" if interval == '10min' else "Day of Month",
+            title=xaxis_title,
             tickmode='array',
             tickvals=tickvals,
             ticktext=ticktext,
@@ -94,8 +146,210 @@ def create_multigraph(time_labels, max_dba, vehicle_counts, interval='10min'):
         showlegend=True,
         legend=dict(x=0.1, y=1.1, orientation='h')
     )
+    return json.dumps(layout, cls=plotly.utils.PlotlyJSONEncoder)
+
+# The layouts (including the expanded ggplot2 template) never change, so they
+# are serialized once at import instead of validating a go.Figure per request.
+LAYOUTS = {interval: build_layout(interval) for interval in ('10min', 'day', 'week')}
+
+def create_multigraph(time_labels, max_dba, vehicle_counts, interval='10min', overlay=None):
+    """Serialize the dBA/vehicle-count graph.
+
+    With overlay, a list of {'period', 'max_dba', 'vehicle_count'} series aligned
+    to time_labels, each period is drawn as its own pair of lines instead.
+    """
+    if overlay:
+        data = []
+        for i, series in enumerate(overlay):
+            color = OVERLAY_COLORS[i % len(OVERLAY_COLORS)]
+            data.append({
+                'type': 'scatter',
+                'x': time_labels,
+                'y': series['max_dba'],
+                'name': f"{series['period']} Max dBA",
+                'mode': 'lines',
+                'line': {'width': 2, 'color': color},
+                'yaxis': 'y'
+            })
+            data.append({
+                'type': 'scatter',
+                'x': time_labels,
+                'y': series['vehicle_count'],
+                'name': f"{series['period']} Vehicles",
+                'mode': 'lines+markers',
+                'marker': {'size': 4, 'color': color},
+                'line': {'width': 1, 'color': color, 'dash': 'dot'},
+                'yaxis': 'y2'
+            })
+        layout = LAYOUTS.get(interval, LAYOUTS['day'])
+        return f'{{"data": {json.dumps(data, cls=plotly.utils.PlotlyJSONEncoder)}, "layout": {layout}}}'
+    
+    if not time_labels:
+        if interval == '10min':
+            time_labels = [f"{h}:{m:02d}" for h in range(7, 20) for m in range(0, 60, 10)]
+            max_dba = [0] * len(time_labels)
+            vehicle_counts = [0] * len(time_labels)
+        else:
+            time_labels = [str(i) for i in range(1, 32)]
+            max_dba = [0] * 31
+            vehicle_counts = [0] * 31
     
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+    data = [
+        {
+            'type': 'bar',
+            'x': time_labels,
+            'y': max_dba,
+            'name': 'Max dBA',
+            'marker': {'color': '#20c997'},
+            'opacity': 0.6,
+            'yaxis': 'y'
+        },
+        {
+            'type': 'scatter',
+            'x': time_labels,
+            'y': vehicle_counts,
+            'name': 'Vehicle Count',
+            'mode': 'lines+markers',
+            'marker': {'size': 6, 'color': '#fd7e14'},
+            'line': {'width': 2, 'color': '#fd7e14'},
+            'yaxis': 'y2'
+        }
+    ]
+    
+    layout = LAYOUTS.get(interval, LAYOUTS['day'])
+    return f'{{"data": {json.dumps(data, cls=plotly.utils.PlotlyJSONEncoder)}, "layout": {layout}}}'
+
+# Grains accepted by /api/series and the graph interval each one is drawn with
+SERIES_GRAINS = {'day': '10min', 'weekday': '10min', 'week': 'week', 'month': 'day'}
+SERIES_AGGS = ('avg', 'sum', 'max')
+
+def fold_values(values, agg):
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    if agg == 'sum':
+        return sum(values)
+    if agg == 'max':
+        return max(values)
+    return round(sum(values) / len(values), 2)
+
+def build_series(rows, grain, agg):
+    """Bucket summary rows into aligned per-period arrays.
+
+    rows carry 'date', 'vehicle_count', 'max_dba' and, for the 10-minute grains,
+    'hour' and 'ten_min_interval'. When several dates land in the same period and
+    slot (only for grain='weekday'), they are combined with agg; max dBA is
+    averaged for agg='avg' and maxed otherwise.
+    """
+    buckets = {}
+    for row in rows:
+        date = row['date']
+        if grain == 'day':
+            period, slot = date.strftime('%Y-%m-%d'), (row['hour'], row['ten_min_interval'])
+        elif grain == 'weekday':
+            period, slot = date.weekday(), (row['hour'], row['ten_min_interval'])
+        elif grain == 'week':
+            year, week, weekday = date.isocalendar()
+            period, slot = f'{year}-W{week:02d}', weekday - 1
+        else:
+            period, slot = date.strftime('%Y-%m'), date.day
+        max_dba = float(row['max_dba']) if row['max_dba'] is not None else None
+        buckets.setdefault(period, {}).setdefault(slot, []).append((row['vehicle_count'], max_dba))
+    
+    if grain in ('day', 'weekday'):
+        slots = sorted({slot for period_slots in buckets.values() for slot in period_slots})
+        labels = [f"{h}:{i * 10:02d}" for h, i in slots]
+    elif grain == 'week':
+        slots = list(range(7))
+        labels = WEEKDAYS
+    else:
+        slots = list(range(1, 32))
+        labels = [str(d) for d in slots]
+    
+    dba_agg = 'avg' if agg == 'avg' else 'max'
+    series = []
+    for period in sorted(buckets):
+        period_slots = buckets[period]
+        series.append({
+            'period': WEEKDAYS[period] if grain == 'weekday' else period,
+            'vehicle_count': [fold_values([c for c, _ in period_slots.get(slot, [])], agg) for slot in slots],
+            'max_dba': [fold_values([d for _, d in period_slots.get(slot, [])], dba_agg) for slot in slots]
+        })
+    return labels, series
+
+# Changes whenever a deploy changes the graph layouts, invalidating old ETags
+LAYOUT_VERSION = hashlib.sha1(''.join(LAYOUTS.values()).encode()).hexdigest()[:8]
+# Past days and months only change if late logs are ingested, which bumps
+# their generation; browsers may reuse them without asking for a week
+CLOSED_PERIOD_MAX_AGE = 7 * 24 * 3600
+IMAGE_MAX_AGE = 365 * 24 * 3600
+IMAGE_ETAG_CACHE_SIZE = 4096
+
+def period_state(cur, period):
+    """Return (generation, latest ingested date) for a day ('YYYY-MM-DD') or month ('YYYY-MM')."""
+    sql = '''SELECT (SELECT generation FROM data_generation WHERE period = %s) AS generation,
+                    (SELECT MAX(date) FROM daily_summary) AS latest_date'''
+    cur.execute(sql, (period,))
+    row = cur.fetchone()
+    return row['generation'] or 0, row['latest_date']
+
+def is_closed_period(period, latest_date):
+    """A period is closed once a later day has been ingested.
+
+    Logs arrive after their day ends, so the calendar alone would mark a month
+    closed on the 1st while its last day is still missing.
+    """
+    if latest_date is None:
+        return False
+    if len(period) == 7:
+        return latest_date.strftime('%Y-%m') > period
+    return latest_date.strftime('%Y-%m-%d') > period
+
+def choose_encoding():
+    if brotli is not None and 'br' in request.accept_encodings:
+        return 'br'
+    if 'gzip' in request.accept_encodings:
+        return 'gzip'
+    return None
+
+def not_modified(tag, cache_control):
+    response = app.response_class(status=304)
+    response.set_etag(tag)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
+def cached_json(payload, tag, cache_control, encoding):
+    """Build a JSON response with validators, compressed for the client."""
+    response = jsonify(payload)
+    if encoding == 'br':
+        # Quality 5 compresses graph JSON nearly as well as the default 11 at a fraction of the CPU
+        response.set_data(brotli.compress(response.get_data(), quality=5))
+    elif encoding == 'gzip':
+        response.set_data(gzip.compress(response.get_data(), compresslevel=6))
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(tag)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+def period_cache_headers(cur, kind, period):
+    """Return (etag, cache_control, encoding) for a day or month payload.
+
+    The ETag varies with the content encoding, since a strong validator must
+    identify the exact bytes sent.
+    """
+    encoding = choose_encoding()
+    generation, latest_date = period_state(cur, period)
+    tag = f'{kind}-{period}-g{generation}-{LAYOUT_VERSION}'
+    if encoding:
+        tag = f'{tag}-{encoding}'
+    if is_closed_period(period, latest_date):
+        cache_control = f'public, max-age={CLOSED_PERIOD_MAX_AGE}'
+    else:
+        cache_control = 'no-cache'
+    return tag, cache_control, encoding
 
 # Home page
 @app.route('/')
@@ -104,7 +358,7 @@ def home():
 
 @app.route('/by_month')
 def by_month():
-    conn = pymysql.connect(**db_config, autocommit=True)
+    conn = get_db()
     cur = conn.cursor(pymysql.cursors.DictCursor)
     
     # Get all available months with display names
@@ -136,8 +390,7 @@ def by_month():
         top_dba_data = cur.fetchall()
         for row in top_dba_data:
             raw_img = row['debug_img']
-            encrypted_img = encrypt_string(raw_img, KEY)
-            image_url = f'https://filerepo.clarksonmsda.org:444/fetch/{encrypted_img}'
+            image_url = grid_image_url(raw_img)
             grid_data.append({
                 'traffic_id': row['traffic_id'],
                 'max_dba': float(row['max_dba']),
@@ -172,7 +425,7 @@ def by_month():
     graphJSON = create_multigraph(time_labels, max_dba, vehicle_counts, interval='day')
     
     cur.close()
-    conn.close()
+    release_db(conn)
     
     return render_template('dashboard_month.html', 
                          all_months=all_months,
@@ -183,7 +436,7 @@ def by_month():
 
 @app.route('/by_day')
 def by_day():
-    conn = pymysql.connect(**db_config, autocommit=True)
+    conn = get_db()
     cur = conn.cursor(pymysql.cursors.DictCursor)
     
     # Get all available dates
@@ -206,8 +459,7 @@ def by_day():
         top_dba_data = cur.fetchall()
         for row in top_dba_data:
             raw_img = row['debug_img']
-            encrypted_img = encrypt_string(raw_img, KEY)
-            image_url = f'https://filerepo.clarksonmsda.org:444/fetch/{encrypted_img}'
+            image_url = grid_image_url(raw_img)
             grid_data.append({
                 'traffic_id': row['traffic_id'],
                 'max_dba': float(row['max_dba']),
@@ -242,7 +494,7 @@ def by_day():
     graphJSON = create_multigraph(time_labels, max_dba, vehicle_counts, interval='10min')
     
     cur.close()
-    conn.close()
+    release_db(conn)
     
     return render_template('dashboard_day.html', 
                          all_dates=all_dates,
@@ -251,18 +503,25 @@ def by_day():
                          vehicle_count=vehicle_count,
                          graphJSON=graphJSON)
 
-@app.route('/update_month_data', methods=['POST'])
+@app.route('/update_month_data', methods=['GET', 'POST'])
 def update_month_data():
-    selected_month = request.form['month']
+    selected_month = request.values.get('month')
     if not selected_month or selected_month == 'default':
         return jsonify({
             'vehicle_count': 0,
             'graphJSON': create_multigraph([], [], [], interval='day')
         })
     
-    conn = pymysql.connect(**db_config, autocommit=True)
+    conn = get_db()
     cur = conn.cursor(pymysql.cursors.DictCursor)
     
+    # Answer revalidations from the generation marker alone
+    etag, cache_control, encoding = period_cache_headers(cur, 'month', selected_month)
+    if request.if_none_match.contains(etag):
+        cur.close()
+        release_db(conn)
+        return not_modified(etag, cache_control)
+    
     # Get summary stats (only vehicle count)
     sql = '''SELECT SUM(vehicle_count) AS vehicle_count
              FROM monthly_summary 
@@ -284,7 +543,7 @@ def update_month_data():
     daily_data = cur.fetchall()
     
     cur.close()
-    conn.close()
+    release_db(conn)
     
     # Prepare data for multigraph
     time_labels = [str(row['day']) for row in daily_data]
@@ -293,23 +552,30 @@ def update_month_data():
     
     graphJSON = create_multigraph(time_labels, max_dba_list, vehicle_counts, interval='day')
     
-    return jsonify({
+    return cached_json({
         'vehicle_count': vehicle_count,
         'graphJSON': graphJSON
-    })
+    }, etag, cache_control, encoding)
 
-@app.route('/update_day_data', methods=['POST'])
+@app.route('/update_day_data', methods=['GET', 'POST'])
 def update_day_data():
-    selected_date = request.form['date']
+    selected_date = request.values.get('date')
     if not selected_date or selected_date == 'default':
         return jsonify({
             'vehicle_count': 0,
             'graphJSON': create_multigraph([], [], [], interval='10min')
         })
     
-    conn = pymysql.connect(**db_config, autocommit=True)
+    conn = get_db()
     cur = conn.cursor(pymysql.cursors.DictCursor)
     
+    # Answer revalidations from the generation marker alone
+    etag, cache_control, encoding = period_cache_headers(cur, 'day', selected_date)
+    if request.if_none_match.contains(etag):
+        cur.close()
+        release_db(conn)
+        return not_modified(etag, cache_control)
+    
     # Get summary stats (only vehicle count)
     sql = '''SELECT SUM(vehicle_count) AS vehicle_count
              FROM daily_summary 
@@ -332,7 +598,7 @@ def update_day_data():
     interval_data = cur.fetchall()
     
     cur.close()
-    conn.close()
+    release_db(conn)
     
     # Prepare data for multigraph
     time_labels = [f"{row['hour']}:{row['ten_min_interval'] * 10:02d}" for row in interval_data]
@@ -341,14 +607,142 @@ def update_day_data():
     
     graphJSON = create_multigraph(time_labels, max_dba_list, vehicle_counts, interval='10min')
     
-    return jsonify({
+    return cached_json({
         'vehicle_count': vehicle_count,
         'graphJSON': graphJSON
+    }, etag, cache_control, encoding)
+
+@app.route('/api/series')
+def api_series():
+    """Aligned vehicle-count and max-dBA arrays for every period in a date range.
+
+    Query parameters: start and end (YYYY-MM-DD, inclusive), grain (day, weekday,
+    week or month), agg (avg, sum or max) and graph=1 to include an overlay graph.
+    """
+    grain = request.args.get('grain', 'day')
+    agg = request.args.get('agg', 'avg')
+    try:
+        start_date = datetime.strptime(request.args.get('start', ''), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args.get('end', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'start and end must be dates in YYYY-MM-DD format'}), 400
+    if end_date < start_date:
+        return jsonify({'error': 'end must not be before start'}), 400
+    if grain not in SERIES_GRAINS:
+        return jsonify({'error': f"grain must be one of {', '.join(SERIES_GRAINS)}"}), 400
+    if agg not in SERIES_AGGS:
+        return jsonify({'error': f"agg must be one of {', '.join(SERIES_AGGS)}"}), 400
+    
+    conn = get_db()
+    cur = conn.cursor(pymysql.cursors.DictCursor)
+    
+    # One range scan on the summary table's primary key covers every period
+    if grain in ('day', 'weekday'):
+        sql = '''SELECT date, hour, ten_min_interval, max_dba, vehicle_count
+                 FROM daily_summary
+                 WHERE date BETWEEN %s AND %s'''
+        cur.execute(sql, (start_date, end_date))
+        rows = cur.fetchall()
+    else:
+        sql = '''SELECT month, day, max_dba, vehicle_count
+                 FROM monthly_summary
+                 WHERE month BETWEEN %s AND %s'''
+        cur.execute(sql, (start_date.strftime('%Y-%m'), end_date.strftime('%Y-%m')))
+        rows = []
+        for row in cur.fetchall():
+            row['date'] = datetime.strptime(f"{row['month']}-{row['day']:02d}", '%Y-%m-%d').date()
+            if start_date <= row['date'] <= end_date:
+                rows.append(row)
+    
+    cur.close()
+    release_db(conn)
+    
+    labels, series = build_series(rows, grain, agg)
+    payload = {
+        'start': start_date.strftime('%Y-%m-%d'),
+        'end': end_date.strftime('%Y-%m-%d'),
+        'grain': grain,
+        'agg': agg,
+        'labels': labels,
+        'series': series
+    }
+    if request.args.get('graph'):
+        payload['graphJSON'] = create_multigraph(labels, [], [], interval=SERIES_GRAINS[grain], overlay=series)
+    return jsonify(payload)
+
+@app.route('/api/quantiles')
+def api_quantiles():
+    """Per-event max dBA quantiles over a date range, merged from daily sketches.
+
+    Query parameters: start and end (YYYY-MM-DD, inclusive) and q, a comma
+    separated list of quantiles (default 0.5,0.9,0.99).
+    """
+    try:
+        start_date = datetime.strptime(request.args.get('start', ''), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args.get('end', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'start and end must be dates in YYYY-MM-DD format'}), 400
+    if end_date < start_date:
+        return jsonify({'error': 'end must not be before start'}), 400
+    try:
+        quantiles = [float(q) for q in request.args.get('q', '0.5,0.9,0.99').split(',')]
+    except ValueError:
+        return jsonify({'error': 'q must be a comma separated list of numbers'}), 400
+    if not all(0 <= q <= 1 for q in quantiles):
+        return jsonify({'error': 'q values must be between 0 and 1'}), 400
+    
+    conn = get_db()
+    cur = conn.cursor(pymysql.cursors.DictCursor)
+    
+    # One sketch per day, read with a range scan on the primary key
+    sql = '''SELECT month, day, dba_sketch
+             FROM monthly_summary
+             WHERE month BETWEEN %s AND %s'''
+    cur.execute(sql, (start_date.strftime('%Y-%m'), end_date.strftime('%Y-%m')))
+    sketch = DBASketch()
+    for row in cur.fetchall():
+        date = datetime.strptime(f"{row['month']}-{row['day']:02d}", '%Y-%m-%d').date()
+        if start_date <= date <= end_date:
+            sketch.merge(DBASketch.from_json(row['dba_sketch']))
+    
+    cur.close()
+    release_db(conn)
+    
+    return jsonify({
+        'start': start_date.strftime('%Y-%m-%d'),
+        'end': end_date.strftime('%Y-%m-%d'),
+        'count': sketch.count,
+        'quantiles': {f'p{q * 100:g}': sketch.quantile(q) for q in quantiles}
     })
 
+@app.route('/export/<dataset>.<fmt>')
+def export_data(dataset, fmt):
+    """Stream events or summaries as CSV or Parquet.
+
+    Filters: start, end (YYYY-MM-DD), cam and min_dba. Rows are read from a
+    server-side cursor and sent with chunked transfer encoding, so memory use
+    does not grow with the size of the export.
+    """
+    try:
+        pieces = export.export(app.config['DATABASE'], dataset, fmt,
+                               start=request.args.get('start'),
+                               end=request.args.get('end'),
+                               cam=request.args.get('cam'),
+                               min_dba=request.args.get('min_dba'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if fmt == 'parquet':
+        if importlib.util.find_spec('pyarrow') is None:
+            return jsonify({'error': 'parquet export requires pyarrow'}), 501
+    return Response(
+        stream_with_context(pieces),
+        mimetype=export.FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={dataset}.{fmt}'}
+    )
+
 @app.route('/view_image/<int:traffic_id>')
 def view_image(traffic_id):
-    conn = pymysql.connect(**db_config, autocommit=True)
+    conn = get_db()
     cur = conn.cursor(pymysql.cursors.DictCursor)
     
     # Fetch image details
@@ -364,22 +758,21 @@ def view_image(traffic_id):
     result = cur.fetchone()
     
     cur.close()
-    conn.close()
+    release_db(conn)
     
     if not result:
         return "Image not found", 404
     
     # Prepare image details
-    raw_img = result['debug_img']
-    encrypted_img = encrypt_string(raw_img, KEY)
-    image_url = f'https://filerepo.clarksonmsda.org:444/fetch/{encrypted_img}'
+    # A Fernet token differs on every render, so the page links the proxy by
+    # traffic_id to give browsers a stable, cacheable URL
+    image_url = url_for('proxy_image', traffic_id=traffic_id)
     
     image_details = {
         'traffic_id': result['traffic_id'],
         'max_dba': float(result['max_dba']) if result['max_dba'] else 0,
         'dto': result['dto'].strftime('%Y-%m-%d %H:%M:%S') if result['dto'] else 'N/A',
-        'image_url': image_url,
-        'encrypted_img': encrypted_img  # Pass encrypted_img for proxy route
+        'image_url': image_url
     }
     
     return render_template('view_image.html', 
@@ -387,22 +780,65 @@ def view_image(traffic_id):
                          traffic_id=traffic_id, 
                          image_details=image_details)
 
-@app.route('/proxy_image/<path:encrypted_img>')
-def proxy_image(encrypted_img):
+@app.route('/proxy_image/<int:traffic_id>')
+def proxy_image(traffic_id):
+    cache_control = f'public, max-age={IMAGE_MAX_AGE}, immutable'
+    # Images never change once written, so a known ETag needs no lookup or fetch
+    known_etag = _image_etags.get(traffic_id)
+    if known_etag and request.if_none_match.contains(known_etag):
+        return not_modified(known_etag, cache_control)
     try:
-        url = f'https://filerepo.clarksonmsda.org:444/fetch/{encrypted_img}'
-        response = requests.get(url, stream=True)
-        if response.status_code != 200:
+        conn = get_db()
+        cur = conn.cursor(pymysql.cursors.DictCursor)
+        cur.execute('SELECT debug_img FROM TrafficData WHERE traffic_id = %s', (traffic_id,))
+        result = cur.fetchone()
+        cur.close()
+        release_db(conn)
+        if not result:
             return "Image not found", 404
-        return send_file(
-            BytesIO(response.content),
-            mimetype=response.headers.get('Content-Type', 'image/jpeg'),
-            as_attachment=True,
-            download_name=f'image_{encrypted_img[-10:]}.jpg'
+        
+        raw_img = result['debug_img']
+        local_path = image_warmup.image_path(app.config['IMAGE_CACHE'], raw_img)
+        if os.path.exists(local_path):
+            with open(local_path, 'rb') as f:
+                content = f.read()
+            mimetype = 'image/jpeg'
+        else:
+            url = f'https://filerepo.clarksonmsda.org:444/fetch/{encrypt_string(raw_img)}'
+            # Bounded like the warmup worker so a stalled file repository cannot hold a worker thread
+            response = requests.get(url, timeout=30)
+            if response.status_code != 200:
+                return "Image not found", 404
+            content = response.content
+            mimetype = response.headers.get('Content-Type', 'image/jpeg')
+        etag = hashlib.sha256(content).hexdigest()
+        _image_etags[traffic_id] = etag
+        if len(_image_etags) > IMAGE_ETAG_CACHE_SIZE:
+            _image_etags.popitem(last=False)
+        if request.if_none_match.contains(etag):
+            return not_modified(etag, cache_control)
+        image_response = send_file(
+            BytesIO(content),
+            mimetype=mimetype,
+            as_attachment='download' in request.args,
+            download_name=f'vehicle_image_{traffic_id}.jpg',
+            etag=etag
         )
+        image_response.headers['Cache-Control'] = cache_control
+        return image_response
     except Exception as e:
         print(f"Proxy image error: {e}")
         return "Error fetching image", 500
 
+@app.route('/thumb/<name>')
+def cached_thumbnail(name):
+    return send_from_directory(os.path.join(app.config['IMAGE_CACHE'], 'thumb'), name,
+                               max_age=IMAGE_MAX_AGE)
+
+@app.route('/cached_image/<name>')
+def cached_full_image(name):
+    return send_from_directory(os.path.join(app.config['IMAGE_CACHE'], 'full'), name,
+                               max_age=IMAGE_MAX_AGE)
+
 if __name__ == '__main__':
-    app.run()
\ No newline at end of file
+    create_app().run()
\ No newline at end of file
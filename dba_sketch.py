@@ -0,0 +1,118 @@
+import json
+import math
+
+# DDSketch with 1% relative accuracy: any quantile is reported within 1% of the
+# true per-event max dBA, and sketches merge exactly by adding bucket counts.
+# dBA values span roughly 30-120, which is under 100 buckets per sketch.
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+class DBASketch:
+    """Mergeable quantile sketch of per-event max dBA values."""
+
+    def __init__(self, bins=None, zero_count=0):
+        self.bins = bins or {}
+        self.zero_count = zero_count
+
+    @property
+    def count(self):
+        return self.zero_count + sum(self.bins.values())
+
+    def add(self, value):
+        # Missing readings (None or NaN) are not part of the distribution
+        if value is None or value != value:
+            return
+        value = float(value)
+        if value <= 0:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / LOG_GAMMA)
+        self.bins[key] = self.bins.get(key, 0) + 1
+
+    def merge(self, other):
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        return self
+
+    def quantile(self, q):
+        count = self.count
+        if not count:
+            return None
+        rank = q * (count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return round(2 * GAMMA ** key / (GAMMA + 1), 2)
+        return None
+
+    def to_json(self):
+        return json.dumps({'z': self.zero_count, 'b': {str(k): c for k, c in sorted(self.bins.items())}},
+                          separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, text):
+        if not text:
+            return cls()
+        data = json.loads(text)
+        return cls({int(k): c for k, c in data['b'].items()}, data['z'])
+
+def sketch_json(values):
+    """Serialize a sketch of an iterable of values (used as a pandas aggregation)."""
+    sketch = DBASketch()
+    for value in values:
+        sketch.add(value)
+    return sketch.to_json()
+
+if __name__ == '__main__':
+    # Rebuild every summary sketch from the event tables, for databases created
+    # before the dba_sketch columns existed
+    import pymysql
+    import pymysql.cursors
+    from pymysql.constants import CLIENT
+    import yaml
+
+    with open('config.yml', 'r') as f:
+        db_config = yaml.safe_load(f)['database']
+
+    monthly_sketches = {}
+    daily_sketches = {}
+    # FOUND_ROWS makes UPDATE report matched rows, even when the sketch is unchanged
+    conn = pymysql.connect(**db_config, cursorclass=pymysql.cursors.SSCursor,
+                           client_flag=CLIENT.FOUND_ROWS)
+    cur = conn.cursor()
+    cur.execute('''SELECT t.dto, a.max_dba
+                   FROM TrafficData t
+                   JOIN AudioData a ON a.traffic_id = t.traffic_id''')
+    while True:
+        rows = cur.fetchmany(10000)
+        if not rows:
+            break
+        for dto, max_dba in rows:
+            month_key = (dto.strftime('%Y-%m'), dto.day)
+            day_key = (dto.date(), dto.hour, dto.minute // 10)
+            monthly_sketches.setdefault(month_key, DBASketch()).add(max_dba)
+            daily_sketches.setdefault(day_key, DBASketch()).add(max_dba)
+    cur.close()
+
+    cur = conn.cursor()
+    cur.executemany('UPDATE monthly_summary SET dba_sketch = %s WHERE month = %s AND day = %s',
+                    [(s.to_json(), k[0], k[1]) for k, s in monthly_sketches.items()])
+    monthly_matched = cur.rowcount if monthly_sketches else 0
+    cur.executemany('UPDATE daily_summary SET dba_sketch = %s WHERE date = %s AND hour = %s AND ten_min_interval = %s',
+                    [(s.to_json(), k[0], k[1], k[2]) for k, s in daily_sketches.items()])
+    daily_matched = cur.rowcount if daily_sketches else 0
+    conn.commit()
+    cur.close()
+    conn.close()
+    print(f'Rebuilt {len(monthly_sketches)} monthly and {len(daily_sketches)} daily sketches')
+    # A sketch whose bucket has no summary row is dropped; rebuild the rows with
+    # queries 42/43 from the SQL file and run this again
+    print(f'Updated {monthly_matched}/{len(monthly_sketches)} monthly_summary and '
+          f'{daily_matched}/{len(daily_sketches)} daily_summary rows')
+    if monthly_matched < len(monthly_sketches) or daily_matched < len(daily_sketches):
+        print('Warning: some sketches had no summary row and were not stored')
@@ -0,0 +1,75 @@
+import pymysql
+import yaml
+
+# One-off migration for databases created before TrafficData had the uq_event
+# key: keeps the first copy (lowest traffic_id) of every (cam, tid, dto) event,
+# deletes the rest with their AudioData rows, adds the unique key and rebuilds
+# the summary counts that the duplicates inflated.
+
+# Load configuration
+config = yaml.safe_load(open('config.yml', 'r'))
+db_config = config['database']
+
+conn = pymysql.connect(**db_config, autocommit=False)
+cur = conn.cursor(pymysql.cursors.DictCursor)
+
+try:
+    # Delete the audio of every copy after the first, then the copies themselves
+    cur.execute("""
+    DELETE a FROM AudioData a
+    JOIN TrafficData t ON t.traffic_id = a.traffic_id
+    JOIN TrafficData k ON k.cam = t.cam AND k.tid = t.tid AND k.dto = t.dto
+                      AND k.traffic_id < t.traffic_id
+    """)
+    print(f'Deleted {cur.rowcount} duplicate AudioData rows')
+    cur.execute("""
+    DELETE t FROM TrafficData t
+    JOIN TrafficData k ON k.cam = t.cam AND k.tid = t.tid AND k.dto = t.dto
+                      AND k.traffic_id < t.traffic_id
+    """)
+    print(f'Deleted {cur.rowcount} duplicate TrafficData rows')
+
+    # Rebuild vehicle_count and max_dba from the remaining events. Upserts, so an
+    # interval whose events had no summary row yet (e.g. a database set up before
+    # ingestion bucketed the stored, rounded dto) gets one instead of losing them
+    cur.execute("""
+    INSERT INTO daily_summary (date, hour, ten_min_interval, vehicle_count, max_dba)
+    SELECT * FROM (
+        SELECT DATE(t.dto) AS date, HOUR(t.dto) AS hour, FLOOR(MINUTE(t.dto) / 10) AS ten_min_interval,
+               COUNT(*) AS vehicle_count, MAX(a.max_dba) AS max_dba
+        FROM TrafficData t
+        JOIN AudioData a ON a.traffic_id = t.traffic_id
+        GROUP BY DATE(t.dto), HOUR(t.dto), FLOOR(MINUTE(t.dto) / 10)
+    ) s
+    ON DUPLICATE KEY UPDATE vehicle_count = VALUES(vehicle_count), max_dba = VALUES(max_dba)
+    """)
+    print(f'Rebuilt daily_summary ({cur.rowcount} rows affected)')
+    cur.execute("""
+    INSERT INTO monthly_summary (month, day, vehicle_count, max_dba)
+    SELECT * FROM (
+        SELECT DATE_FORMAT(t.dto, '%Y-%m') AS month, DAY(t.dto) AS day,
+               COUNT(*) AS vehicle_count, MAX(a.max_dba) AS max_dba
+        FROM TrafficData t
+        JOIN AudioData a ON a.traffic_id = t.traffic_id
+        GROUP BY DATE_FORMAT(t.dto, '%Y-%m'), DAY(t.dto)
+    ) s
+    ON DUPLICATE KEY UPDATE vehicle_count = VALUES(vehicle_count), max_dba = VALUES(max_dba)
+    """)
+    print(f'Rebuilt monthly_summary ({cur.rowcount} rows affected)')
+
+    # Cached dashboard responses must revalidate against the corrected counts
+    cur.execute("UPDATE data_generation SET generation = generation + 1")
+    conn.commit()
+except Exception as e:
+    print(f'Error removing duplicates: {e}')
+    conn.rollback()
+    raise
+
+# DDL commits implicitly, so the key is added once the cleanup is committed
+cur.execute("ALTER TABLE TrafficData ADD UNIQUE KEY uq_event (cam, tid, dto)")
+print('Added uq_event unique key')
+print('Run `python dba_sketch.py` to rebuild the dBA sketches from the remaining events.')
+
+cur.close()
+conn.close()
+print('Database connection closed.')
@@ -0,0 +1,14 @@
+from datetime import datetime, timedelta
+
+def parse_dto(value):
+    """Parse a log timestamp the way MySQL stores it in a DATETIME column.
+
+    Log timestamps carry microseconds ('2025-04-05 07:01:23.300000') and DATETIME
+    rounds fractional seconds half up, so an event at 11:29:59.998 is stored as
+    11:30:00. The uq_event key and every summary bucket use this value, so
+    ingestion agrees with the tools that read dto back from the database.
+    """
+    dto = datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S')
+    if value[19:] and float('0' + value[19:]) >= 0.5:
+        dto += timedelta(seconds=1)
+    return dto
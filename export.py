@@ -0,0 +1,258 @@
+import argparse
+import csv
+import io
+import sys
+from datetime import datetime
+import pymysql
+import pymysql.cursors
+import yaml
+
+# Rows fetched from the server-side cursor per round trip; memory stays bounded
+# by one chunk no matter how many rows the export covers
+CHUNK_SIZE = 5000
+
+DBA_COLUMNS = [f'dba{i}' for i in range(1, 31)]
+
+# Column name and type for each dataset, in SELECT order. The types fix the
+# Parquet schema up front so every row group matches.
+DATASETS = {
+    'events': [
+        ('traffic_id', 'int'), ('cam', 'str'), ('dto', 'datetime'), ('probs', 'float'),
+        ('cls', 'int'), ('tid', 'int'), ('debug_img', 'str'), ('snd_file', 'str'),
+        ('snd_lvl', 'float'), ('max_dba', 'decimal')
+    ] + [(column, 'float') for column in DBA_COLUMNS],
+    'daily': [
+        ('date', 'date'), ('hour', 'int'), ('ten_min_interval', 'int'),
+        ('vehicle_count', 'int'), ('max_dba', 'decimal')
+    ],
+    'monthly': [
+        ('month', 'str'), ('day', 'int'), ('vehicle_count', 'int'), ('max_dba', 'decimal')
+    ],
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+def parse_date(value, name):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'{name} must be a date in YYYY-MM-DD format')
+
+def build_query(dataset, start=None, end=None, cam=None, min_dba=None):
+    """Return (sql, params) for an export with every filter in the WHERE clause.
+
+    Event filters hit idx_dto / idx_cam_dto and idx_max_dba; summary filters are
+    ranges on the summary table's primary key.
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"dataset must be one of {', '.join(DATASETS)}")
+    start = parse_date(start, 'start') if start else None
+    end = parse_date(end, 'end') if end else None
+    if min_dba is not None:
+        try:
+            min_dba = float(min_dba)
+        except ValueError:
+            raise ValueError('min_dba must be a number')
+
+    conditions = []
+    params = []
+    if dataset == 'events':
+        sql = f'''SELECT t.traffic_id, t.cam, t.dto, t.probs, t.cls, t.tid, t.debug_img,
+                        a.snd_file, a.snd_lvl, a.max_dba, {', '.join('a.' + c for c in DBA_COLUMNS)}
+                 FROM TrafficData t
+                 JOIN AudioData a ON a.traffic_id = t.traffic_id'''
+        if start:
+            conditions.append('t.dto >= %s')
+            params.append(start)
+        if end:
+            conditions.append('t.dto < %s + INTERVAL 1 DAY')
+            params.append(end)
+        if cam:
+            conditions.append('t.cam = %s')
+            params.append(cam)
+        if min_dba is not None:
+            conditions.append('a.max_dba >= %s')
+            params.append(min_dba)
+        order_by = 't.dto'
+    else:
+        if cam:
+            raise ValueError('cam filter is only available for events')
+        if dataset == 'daily':
+            sql = '''SELECT date, hour, ten_min_interval, vehicle_count, max_dba
+                     FROM daily_summary'''
+            if start:
+                conditions.append('date >= %s')
+                params.append(start)
+            if end:
+                conditions.append('date <= %s')
+                params.append(end)
+            order_by = 'date, hour, ten_min_interval'
+        else:
+            sql = '''SELECT month, day, vehicle_count, max_dba
+                     FROM monthly_summary'''
+            if start:
+                conditions.append('(month, day) >= (%s, %s)')
+                params.extend([start.strftime('%Y-%m'), start.day])
+            if end:
+                conditions.append('(month, day) <= (%s, %s)')
+                params.extend([end.strftime('%Y-%m'), end.day])
+            order_by = 'month, day'
+        if min_dba is not None:
+            conditions.append('max_dba >= %s')
+            params.append(min_dba)
+
+    if conditions:
+        sql += '\nWHERE ' + ' AND '.join(conditions)
+    sql += f'\nORDER BY {order_by}'
+    return sql, params
+
+def stream_chunks(db_config, sql, params, chunk_size=CHUNK_SIZE):
+    """Yield lists of row tuples from an unbuffered server-side cursor.
+
+    Uses its own connection: an SSCursor keeps the connection busy until every
+    row has been read, so it must not come from the request pool.
+    """
+    conn = pymysql.connect(**db_config, cursorclass=pymysql.cursors.SSCursor)
+    cur = conn.cursor()
+    completed = False
+    try:
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                completed = True
+                break
+            yield rows
+    finally:
+        if completed:
+            cur.close()
+            conn.close()
+        else:
+            # Closing an SSCursor reads and discards every remaining row, so an
+            # aborted export (client disconnect) drops the connection instead;
+            # the server stops the query when the socket goes away
+            try:
+                conn.close()
+            except Exception as e:
+                print(f'Error closing export connection: {e}')
+
+def csv_chunks(columns, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    try:
+        yield buffer.getvalue()
+        for rows in chunks:
+            buffer.seek(0)
+            buffer.truncate(0)
+            writer.writerows(rows)
+            yield buffer.getvalue()
+    finally:
+        # Release the database connection as soon as the client goes away
+        chunks.close()
+
+class ChunkSink:
+    """Write-only file object whose contents are drained after each row group."""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        written = self.buffer.write(data)
+        self.position += written
+        return written
+
+    def tell(self):
+        return self.position
+
+    def writable(self):
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate(0)
+        return data
+
+def parquet_chunks(dataset, chunks):
+    """Yield a Parquet file piecewise, one row group per chunk."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {
+        'int': pa.int64(),
+        'float': pa.float64(),
+        'str': pa.string(),
+        'datetime': pa.timestamp('us'),
+        'date': pa.date32(),
+        'decimal': pa.decimal128(10, 2),
+    }
+    columns = DATASETS[dataset]
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for rows in chunks:
+            arrays = [pa.array([row[i] for row in rows], type=schema.field(i).type)
+                      for i in range(len(columns))]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        chunks.close()
+        writer.close()
+    yield sink.drain()
+
+def export(db_config, dataset, fmt, start=None, end=None, cam=None, min_dba=None, chunk_size=CHUNK_SIZE):
+    """Return a generator of str (csv) or bytes (parquet) pieces for the export."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    sql, params = build_query(dataset, start, end, cam, min_dba)
+    chunks = stream_chunks(db_config, sql, params, chunk_size)
+    if fmt == 'csv':
+        return csv_chunks([name for name, _ in DATASETS[dataset]], chunks)
+    return parquet_chunks(dataset, chunks)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export events or summaries as CSV or Parquet')
+    parser.add_argument('dataset', choices=list(DATASETS))
+    parser.add_argument('--format', choices=list(FORMATS), default='csv')
+    parser.add_argument('--start', help='first date, YYYY-MM-DD')
+    parser.add_argument('--end', help='last date (inclusive), YYYY-MM-DD')
+    parser.add_argument('--cam', help='camera name (events only)')
+    parser.add_argument('--min-dba', type=float, help='minimum max_dba')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('-o', '--output', help='output file (default: stdout for csv)')
+    args = parser.parse_args()
+
+    if args.format == 'parquet' and not args.output:
+        parser.error('--output is required for parquet')
+
+    with open('config.yml', 'r') as f:
+        db_config = yaml.safe_load(f)['database']
+
+    pieces = export(db_config, args.dataset, args.format, args.start, args.end,
+                    args.cam, args.min_dba, args.chunk_size)
+    if args.format == 'csv':
+        out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    else:
+        out = open(args.output, 'wb')
+    try:
+        for piece in pieces:
+            out.write(piece)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f'Exported {args.dataset} as {args.format}', file=sys.stderr)
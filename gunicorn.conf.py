@@ -0,0 +1,21 @@
+import multiprocessing
+import yaml
+
+# Load server settings from the same config.yml as the app
+with open('config.yml', 'r') as f:
+    server_config = (yaml.safe_load(f) or {}).get('server') or {}
+
+wsgi_app = 'wsgi:app'
+bind = f"{server_config.get('host', '0.0.0.0')}:{server_config.get('port', 5000)}"
+workers = server_config.get('workers', multiprocessing.cpu_count() * 2 + 1)
+threads = server_config.get('threads', 4)
+worker_class = 'gthread'
+timeout = server_config.get('timeout', 60)
+
+# Import the app (config, Fernet key, Plotly layouts) once before forking
+preload_app = True
+
+def post_fork(server, worker):
+    # Connection pools and caches must not be shared across processes
+    from app import init_worker
+    init_worker()
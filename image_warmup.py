@@ -0,0 +1,217 @@
+import argparse
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pymysql
+import requests
+import yaml
+from cryptography.fernet import Fernet
+
+FILEREPO_URL = 'https://filerepo.clarksonmsda.org:444/fetch/'
+TOP_N = 100
+# Grid cells are ~50px wide; 160px keeps thumbnails sharp on high-DPI screens
+THUMBNAIL_SIZE = (160, 160)
+# Default cap on the cache size; the oldest images are pruned beyond it
+MAX_CACHE_MB = 500
+
+def cache_name(debug_img):
+    return hashlib.sha1(debug_img.encode('utf-8')).hexdigest() + '.jpg'
+
+def image_path(cache_dir, debug_img):
+    return os.path.join(cache_dir, 'full', cache_name(debug_img))
+
+def thumbnail_path(cache_dir, debug_img):
+    return os.path.join(cache_dir, 'thumb', cache_name(debug_img))
+
+class RateLimiter:
+    """Space requests at least 1/rate seconds apart across all threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+def temp_path(path):
+    # Unique per process and thread: a scheduled warmup and one started by
+    # ingestion can write the same image at once
+    return f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+def remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def write_atomic(path, content):
+    # Write to a temp file first so the app never serves a half-written image
+    tmp_path = temp_path(path)
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except OSError:
+        remove_quietly(tmp_path)
+        raise
+
+def make_thumbnail(cache_dir, debug_img):
+    try:
+        from PIL import Image
+    except ImportError:
+        return False
+    tmp_path = temp_path(thumbnail_path(cache_dir, debug_img))
+    try:
+        with Image.open(image_path(cache_dir, debug_img)) as img:
+            img = img.convert('RGB')
+            img.thumbnail(THUMBNAIL_SIZE)
+            img.save(tmp_path, 'JPEG', quality=80, optimize=True)
+        os.replace(tmp_path, thumbnail_path(cache_dir, debug_img))
+        return True
+    except Exception as e:
+        print(f'Thumbnail error ({debug_img}): {e}')
+        remove_quietly(tmp_path)
+        return False
+
+def fetch_image(session, fernet, limiter, cache_dir, debug_img, retries=3):
+    """Download one image into the cache. Returns 'cached', 'fetched' or 'failed'."""
+    try:
+        # Touch the image so pruning keeps the ones still being warmed
+        os.utime(image_path(cache_dir, debug_img))
+        if not os.path.exists(thumbnail_path(cache_dir, debug_img)):
+            make_thumbnail(cache_dir, debug_img)
+        return 'cached'
+    except FileNotFoundError:
+        # Not cached yet, or just pruned by a concurrent run
+        pass
+    except OSError as e:
+        print(f'Warmup cache error ({debug_img}): {e}')
+        return 'failed'
+    url = FILEREPO_URL + fernet.encrypt(debug_img.encode()).decode()
+    for attempt in range(retries):
+        limiter.wait()
+        try:
+            response = session.get(url, timeout=30)
+            if response.status_code == 200:
+                write_atomic(image_path(cache_dir, debug_img), response.content)
+                make_thumbnail(cache_dir, debug_img)
+                return 'fetched'
+            if response.status_code == 404:
+                break
+        except requests.RequestException as e:
+            print(f'Warmup fetch error ({debug_img}, attempt {attempt + 1}): {e}')
+        except OSError as e:
+            # A write failure (e.g. a full disk) fails this image, not the whole run
+            print(f'Warmup write error ({debug_img}): {e}')
+            return 'failed'
+        if attempt < retries - 1:
+            time.sleep(2 ** attempt)
+    return 'failed'
+
+def prune_cache(cache_dir, max_mb=MAX_CACHE_MB):
+    """Delete the least recently warmed images (and their thumbnails) until the cache fits in max_mb."""
+    entries = []
+    total = 0
+    for name in os.listdir(os.path.join(cache_dir, 'full')):
+        if name.endswith('.tmp'):
+            continue
+        path = os.path.join(cache_dir, 'full', name)
+        thumb = os.path.join(cache_dir, 'thumb', name)
+        try:
+            stat = os.stat(path)
+            size = stat.st_size + (os.path.getsize(thumb) if os.path.exists(thumb) else 0)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, size, path, thumb))
+        total += size
+
+    limit = max_mb * 1024 * 1024
+    removed = 0
+    for _, size, path, thumb in sorted(entries):
+        if total <= limit:
+            break
+        for file_path in (thumb, path):
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+        total -= size
+        removed += 1
+    if removed:
+        print(f'Pruned {removed} images from the cache ({total / 1024 / 1024:.1f} MB left)')
+    return removed
+
+def top_images(cur, date, top_n=TOP_N):
+    # Same ranking as the /by_day grid, as an index range on dto
+    sql = '''SELECT t.debug_img
+             FROM AudioData a
+             JOIN TrafficData t ON a.traffic_id = t.traffic_id
+             WHERE t.dto >= %s AND t.dto < %s + INTERVAL 1 DAY
+             ORDER BY a.max_dba DESC
+             LIMIT %s'''
+    cur.execute(sql, (date, date, top_n))
+    return [row['debug_img'] for row in cur.fetchall()]
+
+def latest_dates(cur, days):
+    cur.execute('SELECT DISTINCT date FROM daily_summary ORDER BY date DESC LIMIT %s', (days,))
+    return [row['date'].strftime('%Y-%m-%d') for row in cur.fetchall()]
+
+def warm_dates(config, dates=None, days=1, top_n=TOP_N, workers=8, rate=10.0, max_mb=None):
+    """Fetch the loudest images of each date (default: the latest days) into the local cache,
+    then prune the cache back to max_mb (default: paths.image_cache_max_mb)."""
+    paths = config.get('paths') or {}
+    cache_dir = paths.get('image_cache', 'image_cache')
+    if max_mb is None:
+        max_mb = paths.get('image_cache_max_mb', MAX_CACHE_MB)
+    os.makedirs(os.path.join(cache_dir, 'full'), exist_ok=True)
+    os.makedirs(os.path.join(cache_dir, 'thumb'), exist_ok=True)
+
+    conn = pymysql.connect(**config['database'], autocommit=True)
+    cur = conn.cursor(pymysql.cursors.DictCursor)
+    if not dates:
+        dates = latest_dates(cur, days)
+    images = []
+    for date in dates:
+        images.extend(top_images(cur, date, top_n))
+    cur.close()
+    conn.close()
+
+    fernet = Fernet(config['key'].encode('utf-8'))
+    limiter = RateLimiter(rate)
+    session = requests.Session()
+    results = {'cached': 0, 'fetched': 0, 'failed': 0}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(lambda img: fetch_image(session, fernet, limiter, cache_dir, img), images):
+            results[result] += 1
+    print(f"Warmup for {', '.join(dates)}: {results['fetched']} fetched, "
+          f"{results['cached']} already cached, {results['failed']} failed")
+    prune_cache(cache_dir, max_mb)
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Prefetch the loudest event images into the local cache')
+    parser.add_argument('--date', action='append', help='date to warm, YYYY-MM-DD (repeatable)')
+    parser.add_argument('--days', type=int, default=1, help='number of latest days to warm when no --date is given')
+    parser.add_argument('--top', type=int, default=TOP_N)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=10.0, help='maximum requests per second')
+    parser.add_argument('--interval', type=float, help='repeat every INTERVAL seconds')
+    parser.add_argument('--max-mb', type=float, help=f'cache size limit in MB (default: paths.image_cache_max_mb or {MAX_CACHE_MB})')
+    args = parser.parse_args()
+
+    with open('config.yml', 'r') as f:
+        config = yaml.safe_load(f)
+
+    while True:
+        warm_dates(config, args.date, args.days, args.top, args.workers, args.rate, args.max_mb)
+        if not args.interval:
+            break
+        time.sleep(args.interval)
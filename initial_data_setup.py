@@ -4,6 +4,8 @@ import pymysql
 import pandas as pd
 from datetime import timedelta, datetime
 import yaml
+from dba_sketch import sketch_json
+from event_time import parse_dto
 
 # Load configuration
 config = yaml.safe_load(open('config.yml', 'r'))
@@ -39,10 +41,20 @@ if data:
 traffic_data_list = []
 audio_data_list = []
 summary_data = []
+seen_events = set()  # Natural keys already queued, so overlapping logs count once
+duplicate_count = 0
 traffic_id_counter = 1
 
 for entry in data:
     try:
+        # Natural key of an event, matching the uq_event index; dto is the value
+        # MySQL stores, so the summaries below bucket it the same way later tools do
+        dto = parse_dto(entry['dto'])
+        key = (entry['cam'], entry['tid'], dto)
+        if key in seen_events:
+            duplicate_count += 1
+            continue
+
         full_img = f'traffic/{entry["full_img"].split("/", 1)[-1]}'
         debug_img = f'traffic/{entry["debug_img"].split("/", 1)[-1]}'
         traffic_tuple = (
@@ -63,7 +75,6 @@ for entry in data:
             ks_time, ke_time, entry['snd']['res']['kd'], *dbas, max_dba
         )
 
-        dto = pd.to_datetime(entry['dto'])
         summary_data.append({
             'traffic_id': traffic_id_counter,
             'dto': dto,
@@ -77,6 +88,7 @@ for entry in data:
 
         traffic_data_list.append(traffic_tuple)
         audio_data_list.append(audio_tuple)
+        seen_events.add(key)
         traffic_id_counter += 1
 
     except Exception as e:
@@ -84,23 +96,28 @@ for entry in data:
         print(entry)
         continue
 
+print(f'Skipped {duplicate_count} duplicate events')
+
 # Convert summary data to DataFrame
 summary_df = pd.DataFrame(summary_data)
+summary_df['dba_sketch'] = summary_df['max_dba']
 
 # Compute Monthly Summary
 monthly_summary = summary_df.groupby(['month', 'day']).agg({
     'traffic_id': 'count',
-    'max_dba': 'max'
+    'max_dba': 'max',
+    'dba_sketch': sketch_json
 }).reset_index()
-monthly_summary.columns = ['month', 'day', 'vehicle_count', 'max_dba']
+monthly_summary.columns = ['month', 'day', 'vehicle_count', 'max_dba', 'dba_sketch']
 monthly_summary_list = [tuple(row) for row in monthly_summary.itertuples(index=False)]
 
 # Compute Daily Summary
 daily_summary = summary_df.groupby(['date', 'hour', 'ten_min_interval']).agg({
     'traffic_id': 'count',
-    'max_dba': 'max'
+    'max_dba': 'max',
+    'dba_sketch': sketch_json
 }).reset_index()
-daily_summary.columns = ['date', 'hour', 'ten_min_interval', 'vehicle_count', 'max_dba']
+daily_summary.columns = ['date', 'hour', 'ten_min_interval', 'vehicle_count', 'max_dba', 'dba_sketch']
 daily_summary_list = [tuple(row) for row in daily_summary.itertuples(index=False)]
 
 # Database Setup
@@ -112,6 +129,7 @@ cur.execute("DROP TABLE IF EXISTS TrafficData")
 cur.execute("DROP TABLE IF EXISTS AudioData")
 cur.execute("DROP TABLE IF EXISTS monthly_summary")
 cur.execute("DROP TABLE IF EXISTS daily_summary")
+cur.execute("DROP TABLE IF EXISTS data_generation")
 
 # Create TrafficData table
 cur.execute("""
@@ -134,7 +152,8 @@ CREATE TABLE TrafficData (
     seq_len INT,
     full_img VARCHAR(500),
     debug_img VARCHAR(500),
-    PRIMARY KEY(traffic_id)
+    PRIMARY KEY(traffic_id),
+    UNIQUE KEY uq_event (cam, tid, dto)
 );
 """)
 
@@ -167,6 +186,7 @@ CREATE TABLE monthly_summary (
     day INT NOT NULL,
     vehicle_count INT,
     max_dba DECIMAL(10,2),
+    dba_sketch TEXT,
     PRIMARY KEY (month, day)
 );
 """)
@@ -179,10 +199,20 @@ CREATE TABLE daily_summary (
     ten_min_interval INT NOT NULL,
     vehicle_count INT,
     max_dba DECIMAL(10,2),
+    dba_sketch TEXT,
     PRIMARY KEY (date, hour, ten_min_interval)
 );
 """)
 
+# Create data_generation table (bumped on every ingestion, used for HTTP ETags)
+cur.execute("""
+CREATE TABLE data_generation (
+    period VARCHAR(10) NOT NULL,
+    generation INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (period)
+);
+""")
+
 # Bulk Inserts
 cur.executemany("""
 INSERT INTO TrafficData (
@@ -206,18 +236,27 @@ VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
 print('Inserted Audio Data Successfully')
 
 cur.executemany("""
-INSERT INTO monthly_summary (month, day, vehicle_count, max_dba)
-VALUES (%s, %s, %s, %s)
+INSERT INTO monthly_summary (month, day, vehicle_count, max_dba, dba_sketch)
+VALUES (%s, %s, %s, %s, %s)
 """, monthly_summary_list)
 print('Inserted Monthly Summary Successfully')
 
 cur.executemany("""
-INSERT INTO daily_summary (date, hour, ten_min_interval, vehicle_count, max_dba)
-VALUES (%s, %s, %s, %s, %s)
+INSERT INTO daily_summary (date, hour, ten_min_interval, vehicle_count, max_dba, dba_sketch)
+VALUES (%s, %s, %s, %s, %s, %s)
 """, daily_summary_list)
 print('Inserted Daily Summary Successfully')
 
+generation_list = [(str(m),) for m in monthly_summary['month'].unique()] + \
+                  [(str(d),) for d in daily_summary['date'].unique()]
+cur.executemany("""
+INSERT INTO data_generation (period, generation)
+VALUES (%s, 1)
+""", generation_list)
+print('Inserted Data Generations Successfully')
+
 cur.execute("CREATE INDEX idx_dto ON TrafficData (dto)")
+cur.execute("CREATE INDEX idx_cam_dto ON TrafficData (cam, dto)")
 print('Created Indexes Successfully')
 
 cur.close()
@@ -0,0 +1,76 @@
+import argparse
+import subprocess
+import sys
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+# Closed-loop load test that starts gunicorn once per worker count and reports
+# how throughput scales, e.g. `python load_test.py --workers 1,2,4`
+parser = argparse.ArgumentParser(description='Measure dashboard throughput across gunicorn worker counts')
+parser.add_argument('--workers', default='1,2,4', help='comma separated gunicorn worker counts')
+parser.add_argument('--path', default='/by_day')
+parser.add_argument('--port', type=int, default=5055)
+parser.add_argument('--concurrency', type=int, default=16)
+parser.add_argument('--duration', type=float, default=20.0)
+args = parser.parse_args()
+
+url = f'http://127.0.0.1:{args.port}{args.path}'
+
+def worker(deadline):
+    session = requests.Session()
+    ok, errors, latencies = 0, 0, []
+    while time.time() < deadline:
+        start = time.time()
+        try:
+            response = session.get(url)
+            if response.status_code == 200:
+                ok += 1
+            else:
+                errors += 1
+        except requests.RequestException:
+            errors += 1
+        latencies.append(time.time() - start)
+    return ok, errors, latencies
+
+def wait_until_ready(process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with code {process.returncode}')
+        try:
+            requests.get(url, timeout=5)
+            return
+        except requests.RequestException:
+            time.sleep(0.5)
+    raise RuntimeError('gunicorn did not start in time')
+
+def run(workers):
+    # Command-line options override gunicorn.conf.py, so only workers and bind change
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                                '-w', str(workers), '-b', f'127.0.0.1:{args.port}'])
+    try:
+        wait_until_ready(process)
+        deadline = time.time() + args.duration
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(worker, [deadline] * args.concurrency))
+    finally:
+        process.terminate()
+        process.wait()
+    ok = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    latencies = sorted(l for r in results for l in r[2])
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+    return ok / args.duration, errors, p50, p95
+
+rows = []
+for workers in [int(w) for w in args.workers.split(',')]:
+    print(f'Running {workers} worker(s) for {args.duration}s...')
+    rows.append((workers, *run(workers)))
+
+baseline = rows[0][1] or 1
+print(f'\nURL: {args.path}, concurrency: {args.concurrency}, duration: {args.duration}s')
+print(f"{'workers':>7} {'req/s':>8} {'speedup':>8} {'errors':>7} {'p50 ms':>7} {'p95 ms':>7}")
+for workers, throughput, errors, p50, p95 in rows:
+    print(f'{workers:>7} {throughput:>8.1f} {throughput / baseline:>7.2f}x {errors:>7} {p50:>7.0f} {p95:>7.0f}')
@@ -1,8 +1,12 @@
 import json
 import os
+import subprocess
+import sys
 import pymysql
 from datetime import timedelta, datetime
 import yaml
+from dba_sketch import DBASketch
+from event_time import parse_dto
 
 # Load configuration
 config = yaml.safe_load(open('config.yml', 'r'))
@@ -32,8 +36,11 @@ if data:
 # Prepare batch insert lists
 traffic_data_list = []
 audio_data_list = []
-monthly_summary_dict = {}  # Key: (month, day), Value: {'vehicle_count': int, 'max_dba': float}
-daily_summary_dict = {}    # Key: (date, hour, ten_min_interval), Value: {'vehicle_count': int, 'max_dba': float}
+event_summary_list = []    # (traffic_id, (month, day), (date, hour, ten_min_interval), max_dba)
+monthly_summary_dict = {}  # Key: (month, day), Value: {'vehicle_count': int, 'max_dba': float, 'dba_sketch': DBASketch}
+daily_summary_dict = {}    # Key: (date, hour, ten_min_interval), Value: {'vehicle_count': int, 'max_dba': float, 'dba_sketch': DBASketch}
+seen_events = set()        # Natural keys already queued in this run
+duplicate_count = 0
 traffic_id_counter = 0
 
 # Connect to SQL database
@@ -45,9 +52,17 @@ cur.execute("SELECT MAX(traffic_id) as max_id FROM TrafficData")
 result = cur.fetchone()
 traffic_id_counter = result['max_id'] + 1 if result['max_id'] is not None else 1
 print(f'Starting traffic_id_counter at: {traffic_id_counter}')
+first_traffic_id = traffic_id_counter
 
 for entry in data:
     try:
+        # Skip events repeated within this run (re-copied or overlapping logs)
+        dto = parse_dto(entry['dto'])
+        key = (entry['cam'], entry['tid'], dto)
+        if key in seen_events:
+            duplicate_count += 1
+            continue
+
         # Process Traffic Data
         full_img = 'traffic/' + entry['full_img'].split('/', 1)[-1]
         debug_img = 'traffic/' + entry['debug_img'].split('/', 1)[-1]
@@ -72,33 +87,18 @@ for entry in data:
         )
 
         # Summary Data
-        dto = datetime.strptime(entry['dto'], '%Y-%m-%d %H:%M:%S')
         month = dto.strftime('%Y-%m')
         day = dto.day
         date = dto.date()
         hour = dto.hour
         ten_min_interval = dto.minute // 10
 
-        # Monthly Summary
-        month_key = (month, day)
-        if month_key not in monthly_summary_dict:
-            monthly_summary_dict[month_key] = {'vehicle_count': 0, 'max_dba': None}
-        monthly_summary_dict[month_key]['vehicle_count'] += 1
-        if max_dba is not None:
-            current_max = monthly_summary_dict[month_key]['max_dba']
-            monthly_summary_dict[month_key]['max_dba'] = max(current_max, max_dba) if current_max is not None else max_dba
-
-        # Daily Summary
-        day_key = (date, hour, ten_min_interval)
-        if day_key not in daily_summary_dict:
-            daily_summary_dict[day_key] = {'vehicle_count': 0, 'max_dba': None}
-        daily_summary_dict[day_key]['vehicle_count'] += 1
-        if max_dba is not None:
-            current_max = daily_summary_dict[day_key]['max_dba']
-            daily_summary_dict[day_key]['max_dba'] = max(current_max, max_dba) if current_max is not None else max_dba
+        # Summaries are only counted once the row is known to be new
+        event_summary_list.append((traffic_id_counter, (month, day), (date, hour, ten_min_interval), max_dba))
 
         traffic_data_list.append(traffic_tuple)
         audio_data_list.append(audio_tuple)
+        seen_events.add(key)
         traffic_id_counter += 1
 
     except Exception as e:
@@ -106,26 +106,75 @@ for entry in data:
         print(f"Problematic entry: {entry}")
         continue
 
-# Convert summary dictionaries to insert lists
-monthly_summary_list = [(k[0], k[1], v['vehicle_count'], v['max_dba']) for k, v in monthly_summary_dict.items()]
-daily_summary_list = [(k[0], k[1], k[2], v['vehicle_count'], v['max_dba']) for k, v in daily_summary_dict.items()]
+print(f'Skipped {duplicate_count} duplicate events within this run')
 
-# Bulk insert TrafficData
+# Bulk insert TrafficData; events already in the database hit uq_event and are
+# left untouched, while any other error still fails the insert
 traffic_sql = """
 INSERT INTO TrafficData (
     traffic_id, cam, probs, cls, dto, save_dto, point_len, intersection_x, intersection_y, 
     box_x1, box_y1, box_x2, box_y2, frame_dto, tid, seq_len, full_img, debug_img
 )
 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE traffic_id = traffic_id
 """
 try:
     cur.executemany(traffic_sql, traffic_data_list)
     conn.commit()
-    print(f'Inserted {len(traffic_data_list)} rows into TrafficData successfully')
+    print(f'Sent {len(traffic_data_list)} rows to TrafficData successfully')
 except Exception as e:
     print(f'Error inserting TrafficData: {e}')
     conn.rollback()
 
+# Find which of this run's ids were actually inserted, in a single query
+cur.execute("SELECT traffic_id FROM TrafficData WHERE traffic_id >= %s", (first_traffic_id,))
+inserted_ids = {row['traffic_id'] for row in cur.fetchall()}
+print(f'{len(inserted_ids)} new events, {len(traffic_data_list) - len(inserted_ids)} already in the database')
+audio_data_list = [row for row in audio_data_list if row[0] in inserted_ids]
+
+for traffic_id, month_key, day_key, max_dba in event_summary_list:
+    if traffic_id not in inserted_ids:
+        continue
+
+    # Monthly Summary
+    if month_key not in monthly_summary_dict:
+        monthly_summary_dict[month_key] = {'vehicle_count': 0, 'max_dba': None, 'dba_sketch': DBASketch()}
+    monthly_summary_dict[month_key]['vehicle_count'] += 1
+    monthly_summary_dict[month_key]['dba_sketch'].add(max_dba)
+    if max_dba is not None:
+        current_max = monthly_summary_dict[month_key]['max_dba']
+        monthly_summary_dict[month_key]['max_dba'] = max(current_max, max_dba) if current_max is not None else max_dba
+
+    # Daily Summary
+    if day_key not in daily_summary_dict:
+        daily_summary_dict[day_key] = {'vehicle_count': 0, 'max_dba': None, 'dba_sketch': DBASketch()}
+    daily_summary_dict[day_key]['vehicle_count'] += 1
+    daily_summary_dict[day_key]['dba_sketch'].add(max_dba)
+    if max_dba is not None:
+        current_max = daily_summary_dict[day_key]['max_dba']
+        daily_summary_dict[day_key]['max_dba'] = max(current_max, max_dba) if current_max is not None else max_dba
+
+# Merge the stored sketches of the touched summary rows into the new ones,
+# one query per table
+if monthly_summary_dict:
+    months = sorted({k[0] for k in monthly_summary_dict})
+    cur.execute(f"SELECT month, day, dba_sketch FROM monthly_summary WHERE month IN ({', '.join(['%s'] * len(months))})", months)
+    for row in cur.fetchall():
+        month_key = (row['month'], row['day'])
+        if month_key in monthly_summary_dict:
+            monthly_summary_dict[month_key]['dba_sketch'].merge(DBASketch.from_json(row['dba_sketch']))
+if daily_summary_dict:
+    dates = sorted({k[0] for k in daily_summary_dict})
+    cur.execute(f"SELECT date, hour, ten_min_interval, dba_sketch FROM daily_summary WHERE date IN ({', '.join(['%s'] * len(dates))})", dates)
+    for row in cur.fetchall():
+        day_key = (row['date'], row['hour'], row['ten_min_interval'])
+        if day_key in daily_summary_dict:
+            daily_summary_dict[day_key]['dba_sketch'].merge(DBASketch.from_json(row['dba_sketch']))
+
+# Convert summary dictionaries to insert lists
+monthly_summary_list = [(k[0], k[1], v['vehicle_count'], v['max_dba'], v['dba_sketch'].to_json()) for k, v in monthly_summary_dict.items()]
+daily_summary_list = [(k[0], k[1], k[2], v['vehicle_count'], v['max_dba'], v['dba_sketch'].to_json()) for k, v in daily_summary_dict.items()]
+
 # Bulk insert AudioData
 audio_sql = """
 INSERT INTO AudioData (
@@ -145,33 +194,65 @@ except Exception as e:
     print(f'Error inserting AudioData: {e}')
     conn.rollback()
 
-# Bulk insert monthly_summary
+# Bulk upsert monthly_summary, adding the new events to existing days
 monthly_summary_sql = """
-INSERT INTO monthly_summary (month, day, vehicle_count, max_dba)
-VALUES (%s, %s, %s, %s)
+INSERT INTO monthly_summary (month, day, vehicle_count, max_dba, dba_sketch)
+VALUES (%s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    vehicle_count = vehicle_count + VALUES(vehicle_count),
+    max_dba = GREATEST(COALESCE(max_dba, VALUES(max_dba)), COALESCE(VALUES(max_dba), max_dba)),
+    dba_sketch = VALUES(dba_sketch)
 """
 try:
     cur.executemany(monthly_summary_sql, monthly_summary_list)
     conn.commit()
-    print(f'Inserted {len(monthly_summary_list)} rows into monthly_summary successfully')
+    print(f'Upserted {len(monthly_summary_list)} rows into monthly_summary successfully')
 except Exception as e:
     print(f'Error inserting monthly_summary: {e}')
     conn.rollback()
 
-# Bulk insert daily_summary
+# Bulk upsert daily_summary, adding the new events to existing intervals
 daily_summary_sql = """
-INSERT INTO daily_summary (date, hour, ten_min_interval, vehicle_count, max_dba)
-VALUES (%s, %s, %s, %s, %s)
+INSERT INTO daily_summary (date, hour, ten_min_interval, vehicle_count, max_dba, dba_sketch)
+VALUES (%s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    vehicle_count = vehicle_count + VALUES(vehicle_count),
+    max_dba = GREATEST(COALESCE(max_dba, VALUES(max_dba)), COALESCE(VALUES(max_dba), max_dba)),
+    dba_sketch = VALUES(dba_sketch)
 """
 try:
     cur.executemany(daily_summary_sql, daily_summary_list)
     conn.commit()
-    print(f'Inserted {len(daily_summary_list)} rows into daily_summary successfully')
+    print(f'Upserted {len(daily_summary_list)} rows into daily_summary successfully')
 except Exception as e:
     print(f'Error inserting daily_summary: {e}')
     conn.rollback()
 
+# Bump the generation of every touched day and month so cached responses revalidate
+generation_list = sorted({(k[0],) for k in monthly_summary_dict} | {(str(k[0]),) for k in daily_summary_dict})
+generation_sql = """
+INSERT INTO data_generation (period, generation)
+VALUES (%s, 1)
+ON DUPLICATE KEY UPDATE generation = generation + 1
+"""
+try:
+    cur.executemany(generation_sql, generation_list)
+    conn.commit()
+    print(f'Bumped generation for {len(generation_list)} periods')
+except Exception as e:
+    print(f'Error updating data_generation: {e}')
+    conn.rollback()
+
 # Clean up
 cur.close()
 conn.close()
-print('Database connection closed.')
\ No newline at end of file
+print('Database connection closed.')
+
+# Prefetch images for the days that received new events in the background
+new_dates = sorted({str(k[0]) for k in daily_summary_dict})
+if new_dates and config.get('warmup', {}).get('enabled', True):
+    warmup_cmd = [sys.executable, 'image_warmup.py']
+    for date in new_dates:
+        warmup_cmd += ['--date', date]
+    subprocess.Popen(warmup_cmd)
+    print(f'Started image warmup for {len(new_dates)} days')
\ No newline at end of file
@@ -195,4 +195,139 @@ SELECT a.traffic_id, t.dto, a.max_dba, t.debug_img
 FROM AudioData a
 JOIN TrafficData t ON a.traffic_id = t.traffic_id
 ORDER BY a.max_dba DESC
-LIMIT 5;
\ No newline at end of file
+LIMIT 5;
+
+-- 26. Create data_generation table (No Arguments)
+-- Tracks an ingestion counter per day ('YYYY-MM-DD') and month ('YYYY-MM'), used for HTTP ETags
+CREATE TABLE data_generation (
+    period VARCHAR(10) NOT NULL,
+    generation INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (period)
+);
+
+-- 27. Get generation for a period (period: VARCHAR, e.g., '2025-04' or '2025-04-25')
+-- Returns the current generation used to build the ETag of dashboard data
+SELECT generation
+FROM data_generation
+WHERE period = %s;
+
+-- 28. Bump generation for a period (period: VARCHAR)
+-- Called by new_data_insertion for every day and month that received data
+INSERT INTO data_generation (period, generation)
+VALUES (%s, 1)
+ON DUPLICATE KEY UPDATE generation = generation + 1;
+
+-- 29. Get 10-minute summaries for a date range (start: DATE, end: DATE)
+-- Used by /api/series for the day and weekday grains; a range scan on the primary key
+SELECT date, hour, ten_min_interval, max_dba, vehicle_count
+FROM daily_summary
+WHERE date BETWEEN %s AND %s;
+
+-- 30. Get daily summaries for a month range (start: VARCHAR, end: VARCHAR, e.g., '2025-01', '2025-04')
+-- Used by /api/series for the week and month grains; a range scan on the primary key
+SELECT month, day, max_dba, vehicle_count
+FROM monthly_summary
+WHERE month BETWEEN %s AND %s;
+
+-- 31. Create index on TrafficData (cam, dto) (No Arguments)
+-- Serves the camera + date range filter of the events export
+CREATE INDEX idx_cam_dto ON TrafficData (cam, dto);
+
+-- 32. Export events with filters (start: DATE, end: DATE, cam: VARCHAR, min_dba: DECIMAL)
+-- Each filter is optional; the export streams the result through a server-side cursor
+SELECT t.traffic_id, t.cam, t.dto, t.probs, t.cls, t.tid, t.debug_img,
+       a.snd_file, a.snd_lvl, a.max_dba, a.dba1, a.dba2, a.dba3, a.dba4, a.dba5, a.dba6,
+       a.dba7, a.dba8, a.dba9, a.dba10, a.dba11, a.dba12, a.dba13, a.dba14, a.dba15,
+       a.dba16, a.dba17, a.dba18, a.dba19, a.dba20, a.dba21, a.dba22, a.dba23, a.dba24,
+       a.dba25, a.dba26, a.dba27, a.dba28, a.dba29, a.dba30
+FROM TrafficData t
+JOIN AudioData a ON a.traffic_id = t.traffic_id
+WHERE t.dto >= %s AND t.dto < %s + INTERVAL 1 DAY AND t.cam = %s AND a.max_dba >= %s
+ORDER BY t.dto;
+
+-- 33. Add natural-key unique index to TrafficData (No Arguments)
+-- One row per (camera, track id, timestamp); existing databases must remove duplicates first (queries 40-43, or `python dedup_events.py`)
+ALTER TABLE TrafficData ADD UNIQUE KEY uq_event (cam, tid, dto);
+
+-- 34. Insert into TrafficData, skipping events already stored (Multiple Arguments)
+-- Used by new_data_insertion; only key conflicts are absorbed, other errors still fail the insert
+INSERT INTO TrafficData (
+    traffic_id, cam, probs, cls, dto, save_dto, point_len, intersection_x, intersection_y, 
+    box_x1, box_y1, box_x2, box_y2, frame_dto, tid, seq_len, full_img, debug_img
+)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE traffic_id = traffic_id;
+
+-- 35. Get traffic_ids inserted in this run (first_traffic_id: INT)
+-- Tells new_data_insertion which events were new, so only those are added to the summaries
+SELECT traffic_id
+FROM TrafficData
+WHERE traffic_id >= %s;
+
+-- 36. Upsert into daily_summary (Multiple Arguments)
+-- Adds new events to an existing 10-minute interval instead of failing on the primary key;
+-- dba_sketch is the existing sketch merged with the new events (needs query 38's column)
+INSERT INTO daily_summary (date, hour, ten_min_interval, vehicle_count, max_dba, dba_sketch)
+VALUES (%s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    vehicle_count = vehicle_count + VALUES(vehicle_count),
+    max_dba = GREATEST(COALESCE(max_dba, VALUES(max_dba)), COALESCE(VALUES(max_dba), max_dba)),
+    dba_sketch = VALUES(dba_sketch);
+
+-- 37. Upsert into monthly_summary (Multiple Arguments)
+-- Adds new events to an existing day instead of failing on the primary key;
+-- dba_sketch is the existing sketch merged with the new events (needs query 38's column)
+INSERT INTO monthly_summary (month, day, vehicle_count, max_dba, dba_sketch)
+VALUES (%s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    vehicle_count = vehicle_count + VALUES(vehicle_count),
+    max_dba = GREATEST(COALESCE(max_dba, VALUES(max_dba)), COALESCE(VALUES(max_dba), max_dba)),
+    dba_sketch = VALUES(dba_sketch);
+
+-- 38. Add dBA quantile sketch columns to the summary tables (No Arguments)
+-- Each row stores a serialized DDSketch of its events' max_dba; fill existing rows with `python dba_sketch.py`
+ALTER TABLE monthly_summary ADD COLUMN dba_sketch TEXT;
+ALTER TABLE daily_summary ADD COLUMN dba_sketch TEXT;
+
+-- 39. Get daily sketches for a month range (start: VARCHAR, end: VARCHAR, e.g., '2025-01', '2025-04')
+-- Used by /api/quantiles, which merges the sketches to answer p50/p90/p99 dBA queries
+SELECT month, day, dba_sketch
+FROM monthly_summary
+WHERE month BETWEEN %s AND %s;
+
+-- 40. Delete AudioData of duplicate events (No Arguments)
+-- Keeps the audio of the first copy (lowest traffic_id) of every (cam, tid, dto) event
+DELETE a FROM AudioData a
+JOIN TrafficData t ON t.traffic_id = a.traffic_id
+JOIN TrafficData k ON k.cam = t.cam AND k.tid = t.tid AND k.dto = t.dto
+                  AND k.traffic_id < t.traffic_id;
+
+-- 41. Delete duplicate TrafficData rows (No Arguments)
+-- Keeps the first copy (lowest traffic_id) of every (cam, tid, dto) event
+DELETE t FROM TrafficData t
+JOIN TrafficData k ON k.cam = t.cam AND k.tid = t.tid AND k.dto = t.dto
+                  AND k.traffic_id < t.traffic_id;
+
+-- 42. Rebuild daily_summary counts from the events (No Arguments)
+-- Corrects vehicle_count and max_dba after duplicates are removed; adds rows for intervals that have none
+INSERT INTO daily_summary (date, hour, ten_min_interval, vehicle_count, max_dba)
+SELECT * FROM (
+    SELECT DATE(t.dto) AS date, HOUR(t.dto) AS hour, FLOOR(MINUTE(t.dto) / 10) AS ten_min_interval,
+           COUNT(*) AS vehicle_count, MAX(a.max_dba) AS max_dba
+    FROM TrafficData t
+    JOIN AudioData a ON a.traffic_id = t.traffic_id
+    GROUP BY DATE(t.dto), HOUR(t.dto), FLOOR(MINUTE(t.dto) / 10)
+) s
+ON DUPLICATE KEY UPDATE vehicle_count = VALUES(vehicle_count), max_dba = VALUES(max_dba);
+
+-- 43. Rebuild monthly_summary counts from the events (No Arguments)
+-- Corrects vehicle_count and max_dba after duplicates are removed; adds rows for days that have none
+INSERT INTO monthly_summary (month, day, vehicle_count, max_dba)
+SELECT * FROM (
+    SELECT DATE_FORMAT(t.dto, '%Y-%m') AS month, DAY(t.dto) AS day,
+           COUNT(*) AS vehicle_count, MAX(a.max_dba) AS max_dba
+    FROM TrafficData t
+    JOIN AudioData a ON a.traffic_id = t.traffic_id
+    GROUP BY DATE_FORMAT(t.dto, '%Y-%m'), DAY(t.dto)
+) s
+ON DUPLICATE KEY UPDATE vehicle_count = VALUES(vehicle_count), max_dba = VALUES(max_dba);
\ No newline at end of file
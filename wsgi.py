@@ -0,0 +1,14 @@
+from app import create_app
+
+# Production entry point: gunicorn imports this module once in the master
+# (preload_app) and forks workers from it.
+app = create_app()
+
+if __name__ == '__main__':
+    # Waitress has no fork, so one process serves requests on a thread pool
+    from waitress import serve
+    server_config = app.config['SERVER']
+    serve(app,
+          host=server_config.get('host', '0.0.0.0'),
+          port=server_config.get('port', 5000),
+          threads=server_config.get('threads', 4))